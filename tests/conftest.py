@@ -6,52 +6,272 @@ executing commands inside containers and verifying security constraints.
 """
 
 import os
+import re
+import secrets
+import shlex
 import subprocess
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
+from functools import cached_property
 from pathlib import Path
 from typing import Generator, Optional
 
+import dns.exception
+import dns.resolver
 import docker
+import docker.utils.socket
 import pytest
+from filelock import FileLock
 
 # Project root directory
 PROJECT_ROOT = Path(__file__).parent.parent
 COMPOSE_DIR = PROJECT_ROOT / "compose"
+TESTS_DIR = PROJECT_ROOT / "tests"
+
+# Test-only overrides that probe healthchecks every second while services
+# start, keyed by the compose file they extend. start_interval needs Docker
+# Engine 25+ (API 1.44), so they are only used where the daemon supports it;
+# the production compose files leave it out to keep working on older engines.
+# Without the overrides the first healthcheck only runs after the regular 30s
+# interval.
+FAST_HEALTHCHECK_OVERRIDES = {
+    "compose.base.yml": str(TESTS_DIR / "compose.healthcheck-base.yml"),
+    "compose.direct.yml": str(TESTS_DIR / "compose.healthcheck-direct.yml"),
+}
+START_INTERVAL_MIN_API_VERSION = "1.44"
+
+# Connection pool size for the shared Docker client, above docker-py's
+# default of 10 so concurrent execs and inspects don't queue for a connection
+DOCKER_MAX_POOL_SIZE = 16
+
+# How much of a failed compose command's stderr to keep in the error
+STDERR_TAIL_BYTES = 4096
+
+# Marker printed between commands by DockerComposeStack.exec_batch
+BATCH_SEPARATOR = "---SEP---"
+
+# In-container lookup used when the host can't reach dnsfilter directly
+# (Node.js, since nslookup isn't available in the agent image)
+NODE_RESOLVE_CMD = """node -e "
+const r = new (require('dns').Resolver)();
+r.setServers(['{server}']);
+r.resolve4('{domain}', (err, addresses) => {{
+  if (err) {{
+    console.log('NXDOMAIN:' + err.code);
+    process.exit(1);
+  }}
+  console.log('RESOLVED:' + addresses.join(','));
+}});
+" 2>&1"""
+
+# Parse NODE_RESOLVE_CMD output; ENODATA means the name exists without an A record
+_RESOLVED_RE = re.compile(r"RESOLVED:(\S+)")
+_NXDOMAIN_RE = re.compile(r"NXDOMAIN:(?:ENOTFOUND|ENODATA)")
 
 
 @dataclass
 class ExecResult:
-    """Result from executing a command in a container."""
+    """
+    Result from executing a command in a container.
+    
+    Output is kept as raw bytes and only decoded when .output is first read.
+    """
     
     exit_code: int
-    output: str
+    output_bytes: bytes
+    
+    @cached_property
+    def output(self) -> str:
+        return self.output_bytes.decode("utf-8", errors="replace")
     
     @property
     def success(self) -> bool:
         return self.exit_code == 0
 
 
+_docker_client: docker.DockerClient | None = None
+
+
+def get_docker_client() -> docker.DockerClient:
+    """Get the Docker client shared by every stack and fixture."""
+    global _docker_client
+    if _docker_client is None:
+        # Created lazily: connecting fails if Docker isn't running, which
+        # shouldn't break tests that don't need it
+        _docker_client = docker.from_env(max_pool_size=DOCKER_MAX_POOL_SIZE)
+    return _docker_client
+
+
+def engine_supports_start_interval() -> bool:
+    """Check whether the Docker daemon honours healthcheck start_interval."""
+    api_version = get_docker_client().version().get("ApiVersion", "0")
+    return docker.utils.version_gte(api_version, START_INTERVAL_MIN_API_VERSION)
+
+
+def _run_compose(
+    cmd: list[str],
+    description: str,
+    env: dict[str, str] | None = None,
+    timeout: float | None = None,
+) -> None:
+    """
+    Run a docker compose command, discarding its output on success.
+    
+    stdout is never needed, so it goes to /dev/null. On failure, raises
+    CalledProcessError carrying the tail of stderr.
+    """
+    result = subprocess.run(
+        cmd,
+        env=env,
+        cwd=PROJECT_ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        timeout=timeout,
+    )
+    if result.returncode != 0:
+        stderr = result.stderr[-STDERR_TAIL_BYTES:].decode("utf-8", errors="replace")
+        raise subprocess.CalledProcessError(
+            result.returncode,
+            result.args,
+            output=f"{description} failed:\nstderr: {stderr}",
+            stderr=stderr,
+        )
+
+
+class ContainerShell:
+    """
+    A long-lived ``sh`` inside a container, driven over its exec socket.
+    
+    Each command is written to the shell's stdin followed by a sentinel
+    carrying its exit code, and output is read back until the sentinel
+    shows up. This replaces the create/start/inspect round-trips of a
+    fresh exec with a single write and read per command.
+    """
+    
+    def __init__(
+        self,
+        client: docker.DockerClient,
+        container_id: str,
+        user: str | None = None,
+    ):
+        exec_id = client.api.exec_create(
+            container_id,
+            ["sh"],
+            stdin=True,
+            tty=False,
+            stdout=True,
+            stderr=True,
+            user=user or "",
+        )
+        self._socket = client.api.exec_start(exec_id, socket=True, detach=False)
+        # exec_start returns a SocketIO wrapper; write to the raw socket
+        self._raw = getattr(self._socket, "_sock", self._socket)
+        self._buffer = b""
+        # Random per-shell token so command output can't fake the sentinel
+        token = secrets.token_hex(4)
+        self._sentinel = f"__END_{token}__"
+        self._sentinel_re = re.compile(rb"\n__END_" + token.encode() + rb"__(\d+)__\n")
+    
+    def run(self, command: str | list[str], merge_stderr: bool = True) -> ExecResult:
+        """
+        Run a command and wait for its output and exit code.
+        
+        A string is run as a shell script in a subshell, which keeps
+        cd/exit/exports from leaking into later commands. An argv list must
+        name a program (not a shell builtin) and runs as a simple command,
+        skipping the subshell fork. stderr is merged into the output unless
+        merge_stderr is False, in which case it is discarded.
+        """
+        # </dev/null stops the command from eating the shell's own input
+        redirects = "</dev/null " + ("2>&1" if merge_stderr else "2>/dev/null")
+        if isinstance(command, list):
+            line = f"{shlex.join(command)} {redirects}\n"
+        else:
+            line = f"( {command}\n) {redirects}\n"
+        self._raw.sendall(
+            f"{line}printf '\\n{self._sentinel}%d__\\n' $?\n".encode()
+        )
+        
+        while (match := self._sentinel_re.search(self._buffer)) is None:
+            _, size = docker.utils.socket.next_frame_header(self._raw)
+            if size < 0:
+                raise ConnectionError("Container shell exited unexpectedly")
+            try:
+                self._buffer += docker.utils.socket.read_exactly(self._raw, size)
+            except docker.utils.socket.SocketError as e:
+                # EOF mid-frame; SocketError isn't an OSError, so convert it
+                # for callers that close broken shells on OSError
+                raise ConnectionError(f"Container shell exited unexpectedly: {e}") from e
+        
+        output = self._buffer[:match.start()]
+        self._buffer = self._buffer[match.end():]
+        return ExecResult(exit_code=int(match.group(1)), output_bytes=output)
+    
+    def close(self) -> None:
+        """Close the socket, which ends the shell via EOF on stdin."""
+        self._socket.close()
+        self._raw.close()
+
+
 class DockerComposeStack:
     """Manages a Docker Compose stack for testing."""
     
-    def __init__(self, compose_files: list[str], project_name: str | None = None):
+    def __init__(
+        self,
+        compose_files: list[str],
+        project_name: str | None = None,
+        client: docker.DockerClient | None = None,
+        fast_healthchecks: bool = False,
+        images_pulled: bool = False,
+    ):
         self.compose_files = compose_files
         self.project_name = project_name  # None = use compose file's project name
-        self.client = docker.from_env()
+        self.client = client or get_docker_client()
+        # Whether the registry images are known to be local already
+        self.images_pulled = images_pulled
+        # With fast_healthchecks, each file is followed by its test override
+        self._files = [
+            path
+            for f in compose_files
+            for path in (f, FAST_HEALTHCHECK_OVERRIDES.get(f) if fast_healthchecks else None)
+            if path is not None
+        ]
+        # Idle persistent shells keyed by (container name, user); a shell is
+        # taken out while in use so concurrent execs each get their own
+        self._shells: dict[tuple[str, str | None], list[ContainerShell]] = {}
+        self._shells_lock = threading.Lock()
+        # None until resolve() gets an answer that shows if the host can reach dnsfilter
+        self._resolve_from_host: bool | None = None
+        self._dnsfilter_address: str | None = None
+        # Container IDs don't change while the stack is up
+        self._container_cache: dict[str, docker.models.containers.Container] = {}
+        
+        self._down_process: subprocess.Popen | None = None
+        
+        # Project name and files never change, so build the prefix once
+        self._cmd_prefix = ["docker", "compose"]
+        if self.project_name:
+            self._cmd_prefix.extend(["-p", self.project_name])
+        for f in self._files:
+            # Absolute override paths are kept as-is by the join
+            self._cmd_prefix.extend(["-f", str(COMPOSE_DIR / f)])
     
     def _compose_cmd(self, *args: str) -> list[str]:
         """Build docker compose command with project name and files."""
-        cmd = ["docker", "compose"]
-        if self.project_name:
-            cmd.extend(["-p", self.project_name])
-        for f in self.compose_files:
-            cmd.extend(["-f", str(COMPOSE_DIR / f)])
-        cmd.extend(args)
-        return cmd
+        return [*self._cmd_prefix, *args]
     
     def up(self, wait_for_healthy: bool = True, timeout: int = 60) -> None:
-        """Start the compose stack."""
+        """
+        Start the compose stack.
+        
+        With wait_for_healthy, compose's --wait blocks until every service is
+        running, and healthy if it has a healthcheck, for up to timeout seconds.
+        """
+        self._container_cache.clear()
+        
         # Create a dummy project directory for mounting
         project_dir = PROJECT_ROOT / "tests" / ".test-project"
         project_dir.mkdir(exist_ok=True)
@@ -59,108 +279,322 @@ class DockerComposeStack:
         env = os.environ.copy()
         env["PROJECT_PATH"] = str(project_dir)
         
+        args = ["up", "-d"]
+        if self.images_pulled:
+            # Images are already local; skip resolving them again
+            args += ["--pull", "never"]
+        # The base-only step just creates networks; the full up below waits
+        # for the base services too, so their healthchecks overlap the agent's
+        wait_args = []
+        if wait_for_healthy:
+            # Services without a healthcheck (dnsfilter) only need to be running
+            wait_args = ["--wait", "--wait-timeout", str(timeout)]
+        
         # For sandbox stack, we need to start base first to create networks,
         # then start the full stack
         if len(self.compose_files) > 1 and "compose.base.yml" in self.compose_files:
-            # Start base services first to create networks
+            # Start base services first to create networks, with the same
+            # base override as the full stack so nothing is recreated
+            base_files = ("compose.base.yml", FAST_HEALTHCHECK_OVERRIDES["compose.base.yml"])
             base_cmd = ["docker", "compose"]
-            base_cmd.extend(["-f", str(COMPOSE_DIR / "compose.base.yml")])
-            base_cmd.extend(["up", "-d"])
+            for f in self._files:
+                if f in base_files:
+                    base_cmd.extend(["-f", str(COMPOSE_DIR / f)])
+            base_cmd.extend(args)
             
-            result = subprocess.run(
-                base_cmd,
-                env=env,
-                cwd=PROJECT_ROOT,
-                capture_output=True,
-                text=True,
-            )
-            if result.returncode != 0:
-                error_msg = f"Base compose failed:\nstdout: {result.stdout}\nstderr: {result.stderr}"
-                raise subprocess.CalledProcessError(
-                    result.returncode,
-                    result.args,
-                    output=error_msg,
-                    stderr=result.stderr,
-                )
-            
-            # Wait for base services to fully start
-            time.sleep(3)
-        
-        # Build compose command for full stack
-        # Note: Don't use --wait because dnsfilter has no healthcheck
-        args = ["up", "-d"]
+            _run_compose(base_cmd, "Base compose", env=env, timeout=timeout + 10)
         
         # Start services
-        result = subprocess.run(
-            self._compose_cmd(*args),
-            env=env,
-            cwd=PROJECT_ROOT,
-            capture_output=True,
-            text=True,
+        _run_compose(
+            self._compose_cmd(*args, *wait_args), "Compose up", env=env, timeout=timeout + 10,
         )
-        
-        if result.returncode != 0:
-            error_msg = f"Compose up failed:\nstdout: {result.stdout}\nstderr: {result.stderr}"
-            raise subprocess.CalledProcessError(
-                result.returncode,
-                result.args,
-                output=error_msg,
-                stderr=result.stderr,
-            )
-        
-        # Wait for services to stabilize (since we can't use --wait with dnsfilter)
-        time.sleep(5 if wait_for_healthy else 2)
     
     def down(self, volumes: bool = True) -> None:
         """Stop and remove the compose stack."""
+        self.down_async(volumes=volumes)
+        self.wait()
+    
+    def down_async(self, volumes: bool = True) -> subprocess.Popen:
+        """
+        Start stopping and removing the compose stack without waiting.
+        
+        Call wait() before reusing the stack. Lets several stacks tear
+        down in parallel.
+        """
         args = ["down"]
         if volumes:
             args.append("-v")
         args.append("--remove-orphans")
         
-        subprocess.run(
+        self._close_shells()
+        self._container_cache.clear()
+        self._dnsfilter_address = None
+        # Exit status is ignored: don't fail if already down
+        self._down_process = subprocess.Popen(
             self._compose_cmd(*args),
-            check=False,  # Don't fail if already down
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        return self._down_process
+    
+    def wait(self) -> None:
+        """Wait for a teardown started by down_async() to finish."""
+        if self._down_process is not None:
+            self._down_process.wait()
+            self._down_process = None
+    
+    def is_running(self) -> bool:
+        """Check whether any of the stack's containers are running."""
+        result = subprocess.run(
+            self._compose_cmd("ps", "-q"),
+            cwd=PROJECT_ROOT,
             capture_output=True,
+            text=True,
         )
+        return bool(result.stdout.strip())
+    
+    def reset(self) -> None:
+        """
+        Restart the stack's containers in place.
+        
+        Much cheaper than down + up: networks and volumes are kept and
+        containers aren't recreated, but each process starts fresh.
+        """
+        self._close_shells()
+        self._container_cache.clear()
+        _run_compose(self._compose_cmd("restart"), "Compose restart")
     
     def get_container(self, name: str) -> Optional[docker.models.containers.Container]:
-        """Get a container by name."""
+        """Get a container by name, cached until the stack goes up or down."""
+        if name in self._container_cache:
+            return self._container_cache[name]
+        
         # Compose files use container_name, so try that first
         try:
-            return self.client.containers.get(name)
+            container = self.client.containers.get(name)
         except docker.errors.NotFound:
             # Try with project prefix if project_name is set
-            if self.project_name:
-                try:
-                    return self.client.containers.get(f"{self.project_name}-{name}-1")
-                except docker.errors.NotFound:
-                    pass
-            return None
+            if not self.project_name:
+                return None
+            try:
+                container = self.client.containers.get(f"{self.project_name}-{name}-1")
+            except docker.errors.NotFound:
+                return None
+        
+        self._container_cache[name] = container
+        return container
     
     def exec_in_container(
         self,
         container_name: str,
         command: str | list[str],
         user: str = None,
+        merge_stderr: bool = True,
     ) -> ExecResult:
-        """Execute a command in a container and return the result."""
-        container = self.get_container(container_name)
-        if container is None:
-            return ExecResult(exit_code=1, output=f"Container {container_name} not found")
+        """
+        Execute a command in a container and return the result.
         
-        if isinstance(command, str):
-            command = ["sh", "-c", command]
+        Commands run in a persistent shell per container and user, which is
+        opened on first use and reused until the stack goes down. Concurrent
+        calls each take their own shell from the pool.
         
-        kwargs = {}
-        if user:
-            kwargs["user"] = user
+        Pass a program without shell features as an argv list to skip the
+        subshell a string command runs in. With merge_stderr=False, only
+        stdout is captured.
+        """
+        key = (container_name, user)
+        with self._shells_lock:
+            idle = self._shells.setdefault(key, [])
+            shell = idle.pop() if idle else None
+        if shell is None:
+            container = self.get_container(container_name)
+            if container is None:
+                return ExecResult(
+                    exit_code=1,
+                    output_bytes=f"Container {container_name} not found".encode(),
+                )
+            shell = ContainerShell(self.client, container.id, user)
+        
+        try:
+            result = shell.run(command, merge_stderr=merge_stderr)
+        except OSError:
+            # Don't return a broken shell to the pool
+            shell.close()
+            raise
+        with self._shells_lock:
+            self._shells.setdefault(key, []).append(shell)
+        return result
+    
+    def exec_many(
+        self,
+        specs: list[tuple[str, str | list[str]]],
+        max_workers: int = 8,
+    ) -> list[ExecResult]:
+        """
+        Execute independent (container name, command) pairs concurrently.
         
-        result = container.exec_run(command, **kwargs)
-        return ExecResult(
-            exit_code=result.exit_code,
-            output=result.output.decode("utf-8", errors="replace"),
+        Results are returned in the same order as specs.
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(lambda spec: self.exec_in_container(*spec), specs))
+    
+    def _close_shells(self) -> None:
+        """Close all persistent container shells."""
+        with self._shells_lock:
+            for idle in self._shells.values():
+                for shell in idle:
+                    shell.close()
+            self._shells.clear()
+    
+    def exec_batch(
+        self,
+        container_name: str,
+        commands: list[str | list[str]],
+        user: str = None,
+    ) -> list[ExecResult]:
+        """
+        Execute several commands with a single exec call.
+        
+        Each command runs in its own subshell, followed by a separator line
+        carrying its exit code, so one exec round-trip yields one result
+        per command.
+        """
+        script = "".join(
+            f"( {command if isinstance(command, str) else shlex.join(command)}\n) 2>&1\n"
+            f"printf '\\n{BATCH_SEPARATOR}%d\\n' $?\n"
+            for command in commands
         )
+        result = self.exec_in_container(container_name, script, user=user)
+        
+        # re.split yields [output, exit_code, output, exit_code, ..., tail]
+        parts = re.split(rb"\n" + BATCH_SEPARATOR.encode() + rb"(\d+)\n", result.output_bytes)
+        results = [
+            ExecResult(exit_code=int(exit_code), output_bytes=output)
+            for output, exit_code in zip(parts[0:-1:2], parts[1::2])
+        ]
+        
+        # The batch died early (e.g. container not found) - report the
+        # remaining commands as failed with whatever output was left
+        while len(results) < len(commands):
+            results.append(ExecResult(exit_code=result.exit_code or 1, output_bytes=parts[-1]))
+        return results
+    
+    def resolve(self, domain: str) -> list[str]:
+        """
+        Resolve a domain's A records through dnsfilter.
+        
+        The query goes straight from the test process to dnsfilter's
+        sandbox_net IP with dnspython, so it costs a single UDP packet
+        instead of an exec. sandbox_net is internal, so dnsfilter can't
+        publish a host port; where the host can't route to container IPs
+        (e.g. Docker Desktop), this falls back to a lookup from the agent.
+        
+        Returns an empty list if the domain doesn't resolve.
+        """
+        if self._resolve_from_host is False:
+            return self._resolve_in_agent(domain)
+        try:
+            addresses = self._resolve_on_host(domain)
+        except (dns.exception.Timeout, OSError):
+            if self._resolve_from_host:
+                raise
+        else:
+            self._resolve_from_host = True
+            return addresses
+        
+        # A timeout may only mean dnsfilter isn't up yet. Give up on the host
+        # once the agent gets an answer and the host still doesn't; if the
+        # agent fails too, this raises and the choice stays open.
+        addresses = self._resolve_in_agent(domain)
+        try:
+            self._resolve_on_host(domain)
+        except (dns.exception.Timeout, OSError):
+            self._resolve_from_host = False
+        else:
+            self._resolve_from_host = True
+        return addresses
+    
+    def wait_for_dns(
+        self,
+        domain: str = "github.com",
+        expected_ip: str = "10.100.1.10",
+        timeout: float = 10,
+    ) -> None:
+        """
+        Block until dnsfilter answers an allowlisted domain correctly.
+        
+        Polls every 100ms instead of sleeping blindly after up(), and
+        fails fast if DNS filtering is actually broken.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                addresses = self.resolve(domain)
+            except (dns.exception.DNSException, OSError, RuntimeError) as e:
+                addresses = [f"error: {e}"]
+            if expected_ip in addresses:
+                return
+            if time.monotonic() > deadline:
+                raise TimeoutError(
+                    f"dnsfilter not answering after {timeout}s: "
+                    f"{domain} -> {addresses}, expected {expected_ip}"
+                )
+            time.sleep(0.1)
+    
+    def resolve_many(self, domains: list[str]) -> dict[str, list[str]]:
+        """Resolve several domains, running agent-side fallbacks concurrently."""
+        if not domains:
+            return {}
+        # The first lookup settles whether the host can reach dnsfilter
+        results = {domains[0]: self.resolve(domains[0])}
+        rest = [domain for domain in domains[1:] if domain not in results]
+        if self._resolve_from_host:
+            results.update((domain, self._resolve_on_host(domain)) for domain in rest)
+        else:
+            execs = self.exec_many([("agent", self._node_resolve_cmd(d)) for d in rest])
+            results.update(
+                (domain, self._parse_node_resolve(domain, result))
+                for domain, result in zip(rest, execs)
+            )
+        return results
+    
+    def _dnsfilter_ip(self) -> str:
+        """Get dnsfilter's IP address on sandbox_net."""
+        if self._dnsfilter_address is None:
+            inspect = self.container_inspect("dnsfilter")
+            if inspect is None:
+                raise RuntimeError("Container dnsfilter not found")
+            networks = inspect["NetworkSettings"]["Networks"]
+            self._dnsfilter_address = next(iter(networks.values()))["IPAddress"]
+        return self._dnsfilter_address
+    
+    def _resolve_on_host(self, domain: str) -> list[str]:
+        """Query dnsfilter from the test process."""
+        resolver = dns.resolver.Resolver(configure=False)
+        resolver.nameservers = [self._dnsfilter_ip()]
+        resolver.lifetime = 2
+        try:
+            answer = resolver.resolve(domain, "A", search=False)
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            return []
+        return [record.address for record in answer]
+    
+    def _resolve_in_agent(self, domain: str) -> list[str]:
+        """Query dnsfilter with a Node.js lookup from the agent."""
+        result = self.exec_in_container("agent", self._node_resolve_cmd(domain))
+        return self._parse_node_resolve(domain, result)
+    
+    def _node_resolve_cmd(self, domain: str) -> str:
+        return NODE_RESOLVE_CMD.format(server=self._dnsfilter_ip(), domain=domain)
+    
+    @staticmethod
+    def _parse_node_resolve(domain: str, result: ExecResult) -> list[str]:
+        """Parse the output of NODE_RESOLVE_CMD."""
+        if match := _RESOLVED_RE.search(result.output):
+            return match.group(1).split(",")
+        if _NXDOMAIN_RE.search(result.output):
+            return []
+        raise RuntimeError(f"DNS lookup for {domain} failed: {result.output}")
     
     def container_inspect(self, container_name: str) -> Optional[dict]:
         """Get full container inspection data."""
@@ -169,16 +603,159 @@ class DockerComposeStack:
             return None
         return self.client.api.inspect_container(container.id)
     
-    def get_container_logs(self, container_name: str, tail: int = 100) -> str:
-        """Get logs from a container."""
+    def get_container_logs(
+        self,
+        container_name: str,
+        tail: int = 100,
+        since: float | None = None,
+    ) -> str:
+        """
+        Get logs from a container.
+        
+        If since (a unix timestamp) is given, returns every line logged from
+        that second on instead of the last tail lines.
+        """
         container = self.get_container(container_name)
         if container is None:
             return ""
-        return container.logs(tail=tail).decode("utf-8", errors="replace")
+        if since is not None:
+            logs = container.logs(since=int(since))
+        else:
+            logs = container.logs(tail=tail)
+        return logs.decode("utf-8", errors="replace")
 
 
-@pytest.fixture(scope="module")
-def sandbox_stack() -> Generator[DockerComposeStack, None, None]:
+def _ensure_clean_state(stack: DockerComposeStack) -> None:
+    """
+    Get a stack into a clean state before bringing it up.
+    
+    A stack left running (e.g. by an aborted run) is just restarted in
+    place, which keeps its networks and volumes; otherwise down clears
+    out any stopped leftovers.
+    """
+    if stack.is_running():
+        stack.reset()
+    else:
+        stack.down()
+
+
+@contextmanager
+def _session_stack(
+    stack: DockerComposeStack,
+    tmp_path_factory: pytest.TempPathFactory,
+    teardowns: list[DockerComposeStack],
+    **up_kwargs,
+) -> Generator[DockerComposeStack, None, None]:
+    """
+    Run a stack for the whole test session.
+    
+    Without pytest-xdist this is a plain down/up/down cycle; the final down
+    only starts, and is added to teardowns to be waited on together with
+    the other stacks'. Under xdist each worker runs its own session against
+    the same fixed container names, so a file lock and a shared user count
+    ensure only the first worker starts the stack and only the last one to
+    finish tears it down (synchronously, so it completes under the lock).
+    """
+    if os.environ.get("PYTEST_XDIST_WORKER") is None:
+        _ensure_clean_state(stack)
+        try:
+            stack.up(**up_kwargs)
+            yield stack
+        finally:
+            stack.down_async()
+            teardowns.append(stack)
+        return
+    
+    # getbasetemp() is per worker; its parent is shared by all workers
+    shared_dir = tmp_path_factory.getbasetemp().parent
+    stack_id = "-".join(Path(f).stem for f in stack.compose_files)
+    users_file = shared_dir / f"{stack_id}.users"
+    lock = FileLock(str(shared_dir / f"{stack_id}.lock"))
+    
+    with lock:
+        users = int(users_file.read_text()) if users_file.exists() else 0
+        if users == 0:
+            _ensure_clean_state(stack)
+            stack.up(**up_kwargs)
+        users_file.write_text(str(users + 1))
+    try:
+        yield stack
+    finally:
+        with lock:
+            users = int(users_file.read_text()) - 1
+            users_file.write_text(str(users))
+            if users == 0:
+                stack.down()
+
+
+@pytest.fixture(scope="session")
+def _stack_teardowns() -> Generator[list[DockerComposeStack], None, None]:
+    """
+    Wait for the session stacks' teardowns to finish.
+    
+    Every stack fixture depends on this, so it is torn down after all of
+    them: the stacks start their downs back to back and this waits on all.
+    """
+    stacks: list[DockerComposeStack] = []
+    yield stacks
+    for stack in stacks:
+        stack.wait()
+
+
+def _pull_images(compose_files: list[str]) -> bool:
+    """
+    Pull the registry images (CoreDNS, nginx) the compose files use.
+    
+    Only missing images are pulled. The agent image is built separately
+    (make build / CI), so buildable services are skipped. Returns whether
+    the pull succeeded; failures (no network) are left for up() to report.
+    """
+    cmd = ["docker", "compose"]
+    for f in compose_files:
+        cmd.extend(["-f", str(COMPOSE_DIR / f)])
+    cmd.extend(["pull", "--quiet", "--ignore-buildable", "--policy", "missing"])
+    
+    try:
+        result = subprocess.run(
+            cmd,
+            cwd=PROJECT_ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=300,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return result.returncode == 0
+
+
+@pytest.fixture(scope="session")
+def _sandbox_images_pulled(tmp_path_factory: pytest.TempPathFactory) -> bool:
+    """
+    Pull the sandbox stack's registry images once per session.
+    
+    Only fixtures that start the sandbox stack depend on this, so runs
+    that need no stack (unit tests, --collect-only) never pull. Under
+    pytest-xdist the first worker pulls under a file lock and records the
+    result for the others.
+    """
+    compose_files = ["compose.base.yml", "compose.direct.yml"]
+    if os.environ.get("PYTEST_XDIST_WORKER") is None:
+        return _pull_images(compose_files)
+    
+    shared_dir = tmp_path_factory.getbasetemp().parent
+    result_file = shared_dir / "images-pulled"
+    with FileLock(str(shared_dir / "images-pulled.lock")):
+        if not result_file.exists():
+            result_file.write_text("1" if _pull_images(compose_files) else "0")
+        return result_file.read_text() == "1"
+
+
+@pytest.fixture(scope="session")
+def sandbox_stack(
+    tmp_path_factory: pytest.TempPathFactory,
+    _stack_teardowns: list[DockerComposeStack],
+    _sandbox_images_pulled: bool,
+) -> Generator[DockerComposeStack, None, None]:
     """
     Fixture providing a running sandbox stack (base + direct).
     
@@ -187,55 +764,61 @@ def sandbox_stack() -> Generator[DockerComposeStack, None, None]:
     - All proxy containers
     - agent container
     
-    The stack is started once per test module and torn down after.
+    The stack is started once per test session and shared by every module;
+    the tests only read container state, so no per-test reset is needed.
     """
     stack = DockerComposeStack(
         compose_files=["compose.base.yml", "compose.direct.yml"],
         # Use compose file's project name (claude-godot-sandbox)
+        fast_healthchecks=engine_supports_start_interval(),
+        images_pulled=_sandbox_images_pulled,
     )
     
-    # Ensure clean state
-    stack.down()
-    
-    try:
-        stack.up(wait_for_healthy=True, timeout=90)
+    with _session_stack(
+        stack, tmp_path_factory, _stack_teardowns, wait_for_healthy=True, timeout=90,
+    ):
+        stack.wait_for_dns()
         yield stack
-    finally:
-        stack.down()
 
 
-@pytest.fixture(scope="module")
-def offline_stack() -> Generator[DockerComposeStack, None, None]:
+@pytest.fixture(scope="session")
+def offline_stack(
+    tmp_path_factory: pytest.TempPathFactory,
+    _stack_teardowns: list[DockerComposeStack],
+) -> Generator[DockerComposeStack, None, None]:
     """
     Fixture providing an offline-mode stack.
     
     This starts only the agent container with network_mode: none.
+    Its container (agent_offline) doesn't clash with the sandbox stack,
+    so both can stay up for the whole session.
     """
-    # First ensure the main stack is down to free up container names
-    main_stack = DockerComposeStack(
-        compose_files=["compose.base.yml", "compose.direct.yml"],
-    )
-    main_stack.down()
-    
     stack = DockerComposeStack(
         compose_files=["compose.offline.yml"],
         # Use compose file's project name
     )
     
-    # Ensure clean state
-    stack.down()
-    
-    try:
-        stack.up(wait_for_healthy=False, timeout=30)
+    with _session_stack(
+        stack, tmp_path_factory, _stack_teardowns, wait_for_healthy=False, timeout=30,
+    ):
         yield stack
-    finally:
-        stack.down()
+
+
+@pytest.fixture(scope="session")
+def agent_resolv_conf(sandbox_stack: DockerComposeStack) -> str:
+    """
+    The sandbox agent's /etc/resolv.conf, read once per session.
+    
+    The file doesn't change while the stack is up, so one exec serves
+    every test that checks it.
+    """
+    return sandbox_stack.exec_in_container("agent", ["cat", "/etc/resolv.conf"]).output
 
 
 @pytest.fixture(scope="session")
 def docker_client() -> docker.DockerClient:
     """Provide a Docker client for tests."""
-    return docker.from_env()
+    return get_docker_client()
 
 
 @pytest.fixture
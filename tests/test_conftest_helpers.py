@@ -0,0 +1,238 @@
+"""
+Unit tests for the exec and DNS helpers in conftest.py.
+
+Drives ContainerShell over a local socket pair, exec_batch over a fake
+exec_in_container and resolve() over fake lookups, so the output framing,
+parsing and DNS fallback are checked without requiring Docker.
+"""
+
+import socket
+import struct
+from unittest.mock import Mock
+
+import dns.exception
+import pytest
+
+from conftest import BATCH_SEPARATOR, ContainerShell, DockerComposeStack, ExecResult
+
+
+# =============================================================================
+# Fixtures
+# =============================================================================
+
+def frame(payload: bytes, stream: int = 1) -> bytes:
+    """Encode payload as one frame of Docker's multiplexed exec stream."""
+    return struct.pack(">BxxxL", stream, len(payload)) + payload
+
+
+@pytest.fixture
+def shell_pair():
+    """A ContainerShell wired to a socket pair, plus the container's end."""
+    ours, theirs = socket.socketpair()
+    client = Mock()
+    client.api.exec_create.return_value = {"Id": "exec-id"}
+    client.api.exec_start.return_value = ours
+    shell = ContainerShell(client, "container-id")
+    yield shell, theirs
+    shell.close()
+    theirs.close()
+
+
+@pytest.fixture
+def stack():
+    """A DockerComposeStack that never talks to Docker."""
+    return DockerComposeStack(compose_files=["compose.offline.yml"], client=Mock())
+
+
+def sentinel(shell: ContainerShell, exit_code: int) -> bytes:
+    """The end-of-command marker the shell prints after a command."""
+    return f"\n{shell._sentinel}{exit_code}__\n".encode()
+
+
+# =============================================================================
+# ContainerShell Tests
+# =============================================================================
+
+class TestContainerShell:
+    """Tests for ContainerShell.run output framing."""
+
+    def test_output_without_trailing_newline(self, shell_pair):
+        """Test output not ending in a newline is returned unchanged."""
+        shell, container = shell_pair
+        container.sendall(frame(b"hello" + sentinel(shell, 0)))
+
+        result = shell.run("printf hello")
+
+        assert result.output == "hello"
+        assert result.exit_code == 0
+        assert result.success
+
+    def test_nonzero_exit_code(self, shell_pair):
+        """Test a failing command's exit code is reported."""
+        shell, container = shell_pair
+        container.sendall(frame(b"no such file\n" + sentinel(shell, 2)))
+
+        result = shell.run(["cat", "/missing"])
+
+        assert result.exit_code == 2
+        assert not result.success
+        assert result.output == "no such file\n"
+
+    def test_sentinel_split_across_frames(self, shell_pair):
+        """Test a sentinel spread over several frames and streams is found."""
+        shell, container = shell_pair
+        payload = b"out" + sentinel(shell, 7)
+        container.sendall(frame(payload[:6]) + frame(payload[6:12], stream=2) + frame(payload[12:]))
+
+        result = shell.run("true")
+
+        assert result.output == "out"
+        assert result.exit_code == 7
+
+    def test_leftover_output_kept_for_next_command(self, shell_pair):
+        """Test output read past one sentinel is used by the next command."""
+        shell, container = shell_pair
+        container.sendall(frame(b"first" + sentinel(shell, 0) + b"second" + sentinel(shell, 1)))
+
+        assert shell.run("echo first").output == "first"
+        result = shell.run("echo second")
+
+        assert result.output == "second"
+        assert result.exit_code == 1
+
+    def test_eof_mid_frame_raises(self, shell_pair):
+        """Test a stream ending inside a frame raises ConnectionError."""
+        shell, container = shell_pair
+        container.sendall(struct.pack(">BxxxL", 1, 100) + b"partial")
+        container.shutdown(socket.SHUT_WR)
+
+        with pytest.raises(ConnectionError):
+            shell.run("true")
+
+    def test_eof_between_frames_raises(self, shell_pair):
+        """Test a stream ending before the sentinel raises ConnectionError."""
+        shell, container = shell_pair
+        container.sendall(frame(b"partial output"))
+        container.shutdown(socket.SHUT_WR)
+
+        with pytest.raises(ConnectionError):
+            shell.run("true")
+
+    def test_command_lines(self, shell_pair):
+        """Test argv is quoted as a simple command and strings run in a subshell."""
+        shell, container = shell_pair
+        container.sendall(frame(sentinel(shell, 0) + sentinel(shell, 0)))
+
+        shell.run(["echo", "a b"])
+        shell.run("cd /tmp; pwd", merge_stderr=False)
+        sent = container.recv(65536).decode()
+
+        assert "echo 'a b' </dev/null 2>&1\n" in sent
+        assert "( cd /tmp; pwd\n) </dev/null 2>/dev/null\n" in sent
+
+
+# =============================================================================
+# exec_batch Tests
+# =============================================================================
+
+class TestExecBatch:
+    """Tests for splitting exec_batch output into per-command results."""
+
+    def batch_output(self, *parts: tuple[bytes, int]) -> ExecResult:
+        """Build the combined output exec_batch's script would produce."""
+        output = b"".join(
+            out + f"\n{BATCH_SEPARATOR}{code}\n".encode() for out, code in parts
+        )
+        return ExecResult(exit_code=0, output_bytes=output)
+
+    def test_splits_results(self, stack):
+        """Test each command gets its own output and exit code."""
+        stack.exec_in_container = Mock(
+            return_value=self.batch_output((b"one\n", 0), (b"two", 1), (b"", 0))
+        )
+
+        results = stack.exec_batch("agent", ["echo one", ["false"], "true"])
+
+        assert [r.output for r in results] == ["one\n", "two", ""]
+        assert [r.exit_code for r in results] == [0, 1, 0]
+
+    def test_sends_one_script(self, stack):
+        """Test every command goes out in a single exec."""
+        stack.exec_in_container = Mock(return_value=self.batch_output((b"", 0), (b"", 0)))
+
+        stack.exec_batch("agent", ["cat /etc/hosts", ["id", "-u"]], user="claude")
+
+        stack.exec_in_container.assert_called_once()
+        _, script = stack.exec_in_container.call_args.args
+        assert "( cat /etc/hosts\n) 2>&1\n" in script
+        assert "( id -u\n) 2>&1\n" in script
+        assert stack.exec_in_container.call_args.kwargs == {"user": "claude"}
+
+    def test_batch_died_early(self, stack):
+        """Test commands after an early failure are reported as failed."""
+        stack.exec_in_container = Mock(
+            return_value=ExecResult(exit_code=1, output_bytes=b"Container agent not found")
+        )
+
+        results = stack.exec_batch("agent", ["true", "true"])
+
+        assert len(results) == 2
+        assert all(r.exit_code == 1 for r in results)
+        assert results[0].output == "Container agent not found"
+
+
+# =============================================================================
+# resolve() Tests
+# =============================================================================
+
+class TestResolveFallback:
+    """Tests for choosing between host and agent DNS lookups."""
+
+    def test_host_success_uses_host(self, stack):
+        """Test a host answer settles on querying from the host."""
+        stack._resolve_on_host = Mock(return_value=["10.100.1.10"])
+        stack._resolve_in_agent = Mock()
+
+        assert stack.resolve("github.com") == ["10.100.1.10"]
+        assert stack._resolve_from_host is True
+        stack._resolve_in_agent.assert_not_called()
+
+    def test_host_timeout_and_agent_failure_stays_undecided(self, stack):
+        """Test a timeout while dnsfilter is still starting decides nothing."""
+        stack._resolve_on_host = Mock(side_effect=dns.exception.Timeout)
+        stack._resolve_in_agent = Mock(side_effect=RuntimeError("lookup failed"))
+
+        with pytest.raises(RuntimeError):
+            stack.resolve("github.com")
+        assert stack._resolve_from_host is None
+
+    def test_host_timeout_after_agent_answer_uses_agent(self, stack):
+        """Test the host is given up on once the agent answers and it doesn't."""
+        stack._resolve_on_host = Mock(side_effect=dns.exception.Timeout)
+        stack._resolve_in_agent = Mock(return_value=["10.100.1.10"])
+
+        assert stack.resolve("github.com") == ["10.100.1.10"]
+        assert stack._resolve_from_host is False
+        assert stack._resolve_on_host.call_count == 2
+
+        stack.resolve("google.com")
+        assert stack._resolve_on_host.call_count == 2
+        stack._resolve_in_agent.assert_called_with("google.com")
+
+    def test_host_answer_after_agent_answer_uses_host(self, stack):
+        """Test a host that answers on the second try is kept."""
+        stack._resolve_on_host = Mock(side_effect=[dns.exception.Timeout(), ["10.100.1.10"]])
+        stack._resolve_in_agent = Mock(return_value=["10.100.1.10"])
+
+        assert stack.resolve("github.com") == ["10.100.1.10"]
+        assert stack._resolve_from_host is True
+
+    def test_host_failure_after_success_raises(self, stack):
+        """Test a host failure is an error once the host is known to work."""
+        stack._resolve_from_host = True
+        stack._resolve_on_host = Mock(side_effect=dns.exception.Timeout)
+        stack._resolve_in_agent = Mock()
+
+        with pytest.raises(dns.exception.Timeout):
+            stack.resolve("github.com")
+        stack._resolve_in_agent.assert_not_called()
@@ -29,7 +29,7 @@ class TestNonRootUser:
         """Verify agent runs as user 'claude' (not root)."""
         result = sandbox_stack.exec_in_container(
             "agent",
-            "whoami",
+            ["whoami"],
         )
         
         assert result.success
@@ -44,7 +44,7 @@ class TestNonRootUser:
         """Verify agent runs with uid 1000."""
         result = sandbox_stack.exec_in_container(
             "agent",
-            "id -u",
+            ["id", "-u"],
         )
         
         assert result.success
@@ -59,7 +59,7 @@ class TestNonRootUser:
         """Verify agent is not running as root."""
         result = sandbox_stack.exec_in_container(
             "agent",
-            "id",
+            ["id"],
         )
         
         assert result.success